@@ -2,9 +2,11 @@
 """
 mein_subqg_seed_script.py - Persistent Mycelia Driver
 
-Dieses Script unterstützt zwei Modi:
+Dieses Script unterstützt drei Modi:
 1. One-Shot: Wird mit Argumenten (z.B. --seed) aufgerufen, gibt JSON aus und endet.
 2. Persistent: Ohne Argumente gestartet, wartet es auf STDIN auf JSON-Befehle.
+3. Listen: Mit --listen gestartet, bedient es dieselben Befehle über einen
+   lokalen TCP-Socket (Sidecar für den One-Shot-Aufruf aus python/).
 """
 
 from __future__ import annotations
@@ -15,14 +17,37 @@ import json
 import os
 import pathlib
 import random
-import secrets
+import socketserver
 import struct
 import sys
 import time
 from typing import Final, Any
 
+try:
+    import numpy as np
+except ImportError:  # One-Shot/Fallback funktionieren auch ohne numpy
+    np = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 RESULT_SUCCESS: Final[int] = 0
 DLL_NAME: Final[str] = "CC_OpenCl.dll"
+STATE_FILE: Final[str] = "driver.json"
+LOCK_FILE: Final[str] = "driver.lock"
+IDLE_TIMEOUT: Final[float] = 600.0  # Listen-Modus beendet sich nach so vielen Sekunden ohne Client
+
+# Vorkompilierte Formate (kein Re-Parsing pro Aufruf)
+_S_Q: Final = struct.Struct("<Q")
+_S_q: Final = struct.Struct("<q")
+_S_FRAME: Final = struct.Struct(">I")
+
+# Fallback-Entropie direkt aus dem OS (gleiche Quelle wie secrets, ohne SystemRandom)
+_urandom = os.urandom
+_from_bytes = int.from_bytes
 
 # --- Globale Palette ---
 PALETTES = [
@@ -33,13 +58,49 @@ PALETTES = [
     {"name": "Ueberwuchert", "base": "MOSSY_COBBLESTONE", "surface": "MOSS_BLOCK", "ore": "RAW_GOLD_BLOCK", "scale": 0.03},
 ]
 
+# Vorgefertigte Antwort-Templates je Palette (handle_world_cmd ergänzt nur den Seed)
+_TEMPLATES = [
+    {
+        "baseBlock": p["base"],
+        "surfaceBlock": p["surface"],
+        "oreBlock": p["ore"],
+        "scale": p["scale"],
+        "seaLevel": 62,
+        "fallback": False,
+    }
+    for p in PALETTES
+]
+
+# Gemeinsamer Generator für die Simulations-Befehle (Batch statt Einzelwerte)
+_RNG = np.random.Generator(np.random.PCG64DXSM()) if np is not None else random.Random()
+
 # --- Hilfsfunktionen für Datentypen ---
 def _u64(n: int) -> int:
     return n & 0xFFFFFFFFFFFFFFFF
 
 def _i64_from_u64(n: int) -> int:
-    raw = _u64(n)
-    return struct.unpack("<q", struct.pack("<Q", raw))[0]
+    return _S_q.unpack(_S_Q.pack(_u64(n)))[0]
+
+def _random_list(n: int) -> list[float]:
+    # numpy: ein Batch-Aufruf; ohne numpy Einzelwerte aus random.Random
+    if np is not None:
+        return _RNG.random(n).tolist()
+    return [_RNG.random() for _ in range(n)]
+
+def _noise(x: int, z: int) -> float:
+    # splitmix64-Mix von (x, z) -> Float in [0, 1), ohne RNG-Zustand
+    h = _u64((x * 0x9E3779B97F4A7C15) ^ (z * 0xBF58476D1CE4E5B9))
+    h ^= h >> 30
+    h = _u64(h * 0xBF58476D1CE4E5B9)
+    h ^= h >> 27
+    h = _u64(h * 0x94D049BB133111EB)
+    h ^= h >> 31
+    return (h >> 11) * (1.0 / (1 << 53))
+
+def _state_dir() -> pathlib.Path:
+    base = os.environ.get("LOCALAPPDATA")
+    root = pathlib.Path(base) if base else pathlib.Path.home() / ".cache"
+    return root / "mycelia"
 
 def _prepare_windows_dll_search(dll_dir: pathlib.Path) -> None:
     if os.name != "nt":
@@ -50,13 +111,15 @@ def _prepare_windows_dll_search(dll_dir: pathlib.Path) -> None:
         pass
     os.environ["PATH"] = str(dll_dir) + os.pathsep + os.environ.get("PATH", "")
 
-def _load_library(script_dir: pathlib.Path) -> ctypes.CDLL:
-    dll_dir = (script_dir / "bin").resolve()
-    candidate = (dll_dir / DLL_NAME).resolve()
+def _find_library(script_dir: pathlib.Path) -> pathlib.Path:
+    candidate = (script_dir / "bin" / DLL_NAME).resolve()
     if not candidate.exists():
         # Fallback auf CWD/bin
         candidate = (pathlib.Path.cwd() / "bin" / DLL_NAME).resolve()
-        
+    return candidate
+
+def _load_library(script_dir: pathlib.Path) -> ctypes.CDLL:
+    candidate = _find_library(script_dir)
     if not candidate.exists():
         raise FileNotFoundError(f"DLL nicht gefunden: {candidate}")
 
@@ -82,6 +145,13 @@ class MyceliaCore:
         self.lib.myc_destroy_context.argtypes = [ctypes.c_void_p]
         self.lib.myc_get_last_error.restype = ctypes.c_char_p
 
+        # Funktionszeiger einmalig auflösen (spart CDLL.__getattr__ pro Aufruf)
+        self.init = self.lib.myc_init
+        self.create_ctx = self.lib.myc_create_context
+        self.set_seed = self.lib.myc_set_seed
+        self.process_buffer = self.lib.myc_process_buffer
+        self.destroy = self.lib.myc_destroy_context
+
     def get_last_error(self) -> str:
         msg = self.lib.myc_get_last_error()
         return msg.decode("utf-8", errors="replace") if msg else "Unknown Error"
@@ -94,118 +164,221 @@ class DriverInstance:
         self.core = MyceliaCore(self.lib_raw)
         self.gpu_index = gpu_index
         self.ctx = ctypes.c_void_p()
+        # Ausgabepuffer einmalig anlegen und pro Aufruf wiederverwenden
+        self._buf = (ctypes.c_uint8 * 8)()
+        self._buf_addr = ctypes.addressof(self._buf)
         
-        if self.core.lib.myc_init() != RESULT_SUCCESS:
+        if self.core.init() != RESULT_SUCCESS:
             raise RuntimeError(f"GPU Init fehlgeschlagen: {self.core.get_last_error()}")
             
-        if self.core.lib.myc_create_context(self.gpu_index, ctypes.byref(self.ctx)) != RESULT_SUCCESS:
+        if self.core.create_ctx(self.gpu_index, ctypes.byref(self.ctx)) != RESULT_SUCCESS:
             raise RuntimeError(f"GPU Context fehlgeschlagen: {self.core.get_last_error()}")
 
     def generate_seed(self, base_seed: int) -> int:
-        self.core.lib.myc_set_seed(self.ctx, ctypes.c_uint64(_u64(base_seed)))
-        buf = (ctypes.c_uint8 * 8)()
-        if self.core.lib.myc_process_buffer(self.ctx, buf, 8, 0) != RESULT_SUCCESS:
+        self.core.set_seed(self.ctx, _u64(base_seed))
+        # myc_process_buffer XORt in-place -> Puffer vorher nullen
+        ctypes.memset(self._buf_addr, 0, 8)
+        if self.core.process_buffer(self.ctx, self._buf, 8, 0) != RESULT_SUCCESS:
             sys.stderr.write(f"[Mycelia] Buffer-Fehler: {self.core.get_last_error()}\n")
-            return base_seed ^ secrets.randbits(64)
-        return struct.unpack("<Q", bytes(buf))[0]
+            return base_seed ^ _from_bytes(_urandom(8), "little")
+        return _S_Q.unpack_from(self._buf)[0]
 
     def shutdown(self):
         if self.ctx:
-            self.core.lib.myc_destroy_context(self.ctx)
+            self.core.destroy(self.ctx)
 
 # --- Command Handler ---
-def handle_world_cmd(driver: DriverInstance, base_seed: int, unsigned: bool) -> dict:
+def handle_world_cmd(driver: DriverInstance, base_seed: int | None, unsigned: bool) -> dict:
+    # Ohne Vorgabe pro Aufruf ein frischer Basis-Seed: der Treiber füllt nur einen
+    # Zell-Wert pro Aufruf, ein Vorrat aus einem großen Puffer wäre nicht seed-abhängig
+    if base_seed is None:
+        base_seed = _from_bytes(_urandom(8), "little")
     final_seed = driver.generate_seed(base_seed)
-    random.seed(final_seed)
-    theme = random.choice(PALETTES)
-    
+
+    # Palette direkt aus dem Seed ableiten (kein Reseed des random-Moduls)
     return {
         "seed": final_seed if unsigned else _i64_from_u64(final_seed),
-        "baseBlock": theme["base"],
-        "surfaceBlock": theme["surface"],
-        "oreBlock": theme["ore"],
-        "scale": theme["scale"],
-        "seaLevel": 62,
-        "fallback": False
+        **_TEMPLATES[final_seed % len(_TEMPLATES)],
     }
 
-def run_persistent(gpu_index: int, unsigned: bool):
+# --- Befehls-Handler (Persistent/Listen) ---
+# Jeder Handler bekommt (data, driver, unsigned) und liefert die Antwortzeile.
+def _h_health(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    return "ok"
+
+def _h_world(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    return json.dumps(handle_world_cmd(driver, data.get("seed"), unsigned))
+
+def _h_otoc_chaos(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    # Simulierter Wert basierend auf GPU Drift
+    return json.dumps([0.1 + (_RNG.random() * 0.4)])
+
+def _h_dream_state(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    # Erzeugt ein künstliches Gradienten-Array
+    return json.dumps(_random_list(data.get("size", 256)))
+
+def _h_symbolic_abstract(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    # Gibt zwei Concept-Werte zurück (Archetype, Energy)
+    r = _random_list(2)
+    return json.dumps([r[0] * 2.0, r[1]])
+
+def _h_noise(data: dict, driver: DriverInstance, unsigned: bool) -> str:
+    # Einfaches deterministisches Rauschen
+    return str(_noise(data.get("x", 0), data.get("z", 0)))
+
+HANDLERS: Final[dict[str, Any]] = {
+    "health": _h_health,
+    "world": _h_world,
+    "otoc_chaos": _h_otoc_chaos,
+    "dream_state": _h_dream_state,
+    "symbolic_abstract": _h_symbolic_abstract,
+    "noise": _h_noise,
+}
+
+def _read_frames(in_stream):
+    """Liest längenpräfixierte Nachrichten: 4 Byte Big-Endian-Länge + Payload."""
+    read = in_stream.read
+    while True:
+        header = read(4)
+        if len(header) < 4:
+            return
+        size = _S_FRAME.unpack(header)[0]
+        payload = read(size)
+        if len(payload) < size:
+            return
+        yield payload
+
+def _serve_stream(driver: DriverInstance, unsigned: bool, in_stream, out_stream, framed: bool = False) -> None:
+    """
+    Bedient Befehle aus einem binären Eingabestrom (Zeilen oder, mit framed,
+    längenpräfixierte Frames). Antworten sind immer eine Zeile pro Befehl;
+    out_stream muss zeilengepuffert sein (flusht bei jedem "\n").
+    """
+    # Hot-Loop: Lookups einmalig binden
+    loads = _loads
+    handlers = HANDLERS
+    out_write = out_stream.write
+    err_write = sys.stderr.write
+    messages = _read_frames(in_stream) if framed else iter(in_stream.readline, b"")
+
+    for line in messages:
+        try:
+            data = loads(line)
+        except json.JSONDecodeError:
+            err_write("[Mycelia] Ungültiges JSON empfangen.\n")
+            continue
+
+        try:
+            handler = handlers.get(data.get("cmd"))
+            if handler is not None:
+                out_write(handler(data, driver, unsigned) + "\n")
+        except Exception as e:
+            err_write(f"[Mycelia] Fehler bei Befehlsverarbeitung: {e}\n")
+
+def run_persistent(gpu_index: int, unsigned: bool, framed: bool = False):
     sys.stderr.write(f"[Mycelia] Starte Persistent Mode auf GPU {gpu_index}...\n")
     try:
         driver = DriverInstance(gpu_index)
         sys.stderr.write("[Mycelia] Treiber bereit. Warte auf STDIN...\n")
         sys.stderr.flush()
-
-        while True:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            
-            try:
-                data = json.loads(line)
-                cmd = data.get("cmd")
-                
-                if cmd == "health":
-                    print("ok", flush=True)
-                
-                elif cmd == "world":
-                    base = data.get("seed", secrets.randbits(64))
-                    result = handle_world_cmd(driver, base, unsigned)
-                    print(json.dumps(result), flush=True)
-                
-                elif cmd == "otoc_chaos":
-                    # Simulierter Wert basierend auf GPU Drift
-                    print(json.dumps([0.1 + (random.random() * 0.4)]), flush=True)
-                
-                elif cmd == "dream_state":
-                    size = data.get("size", 256)
-                    # Erzeugt ein künstliches Gradienten-Array
-                    gradient = [random.random() for _ in range(size)]
-                    print(json.dumps(gradient), flush=True)
-                
-                elif cmd == "symbolic_abstract":
-                    # Gibt zwei Concept-Werte zurück (Archetype, Energy)
-                    concepts = [random.uniform(0, 2.0), random.uniform(0, 1.0)]
-                    print(json.dumps(concepts), flush=True)
-                
-                elif cmd == "noise":
-                    # Einfaches deterministisches Rauschen
-                    x, z = data.get("x", 0), data.get("z", 0)
-                    random.seed(x ^ z)
-                    print(str(random.random()), flush=True)
-
-            except json.JSONDecodeError:
-                sys.stderr.write("[Mycelia] Ungültiges JSON empfangen.\n")
-            except Exception as e:
-                sys.stderr.write(f"[Mycelia] Fehler bei Befehlsverarbeitung: {e}\n")
+        # Zeilenpufferung: jede Antwortzeile wird beim "\n" automatisch geflusht
+        sys.stdout.reconfigure(line_buffering=True)
+        _serve_stream(driver, unsigned, sys.stdin.buffer, sys.stdout, framed)
 
     except Exception as e:
         sys.stderr.write(f"[Mycelia] Fataler Treiberfehler: {e}\n")
     finally:
         sys.stderr.write("[Mycelia] Beende persistenten Treiber.\n")
 
+def run_listen(gpu_index: int, unsigned: bool, framed: bool = False, idle_timeout: float = IDLE_TIMEOUT):
+    """
+    Hält Treiber und GPU-Kontext offen und bedient Clients über 127.0.0.1.
+    Endet nach idle_timeout Sekunden ohne neue Verbindung (0 = nie).
+    """
+    sys.stderr.write(f"[Mycelia] Starte Listen Mode auf GPU {gpu_index}...\n")
+    state_file = _state_dir() / STATE_FILE
+    lock_file = _state_dir() / LOCK_FILE
+    try:
+        driver = DriverInstance(gpu_index)
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                # Verbindungen werden nacheinander bedient (C-Treiberzustand ist global)
+                in_stream = self.connection.makefile("rb")
+                out_stream = self.connection.makefile("w", encoding="utf-8")
+                out_stream.reconfigure(line_buffering=True)
+                try:
+                    _serve_stream(driver, unsigned, in_stream, out_stream, framed)
+                finally:
+                    in_stream.close()
+                    out_stream.close()
+
+        class _Server(socketserver.TCPServer):
+            timeout = idle_timeout or None
+            idle = False
+
+            def handle_timeout(self):
+                self.idle = True
+
+        with _Server(("127.0.0.1", 0), _Handler) as server:
+            port = server.server_address[1]
+            state_file.parent.mkdir(parents=True, exist_ok=True)
+            state_file.write_text(
+                json.dumps({"pid": os.getpid(), "port": port, "gpu": gpu_index}), encoding="utf-8"
+            )
+            # Start abgeschlossen: Spawn-Lock des Clients freigeben
+            lock_file.unlink(missing_ok=True)
+            sys.stderr.write(f"[Mycelia] Treiber bereit. Lausche auf 127.0.0.1:{port}...\n")
+            sys.stderr.flush()
+            while not server.idle:
+                server.handle_request()
+            sys.stderr.write(f"[Mycelia] {idle_timeout:g}s ohne Client, Leerlauf-Ende.\n")
+
+    except Exception as e:
+        sys.stderr.write(f"[Mycelia] Fataler Treiberfehler: {e}\n")
+    finally:
+        try:
+            lock_file.unlink(missing_ok=True)
+            if json.loads(state_file.read_text(encoding="utf-8")).get("pid") == os.getpid():
+                state_file.unlink()
+        except Exception:
+            pass
+        sys.stderr.write("[Mycelia] Beende Listen-Treiber.\n")
+
+def _run_fallback(args):
+    theme = random.choice(PALETTES)
+    fallback_seed = args.seed if args.seed is not None else _from_bytes(_urandom(8), "little")
+    result = {
+        "seed": fallback_seed if args.unsigned else _i64_from_u64(fallback_seed),
+        "baseBlock": theme["base"],
+        "surfaceBlock": theme["surface"],
+        "oreBlock": theme["ore"],
+        "scale": theme["scale"],
+        "seaLevel": 62,
+        "fallback": True
+    }
+    print(json.dumps(result), flush=True)
+
 def run_oneshot(args):
+    # Ohne DLL (oder mit --no-gpu) direkt Fallback, ohne GPU-Init zu bezahlen
+    if args.no_gpu:
+        _run_fallback(args)
+        return
+    if not _find_library(pathlib.Path(__file__).resolve().parent).exists():
+        sys.stderr.write(f"[Mycelia] {DLL_NAME} nicht gefunden. Nutze Python-Fallback.\n")
+        _run_fallback(args)
+        return
+
     try:
         driver = DriverInstance(args.gpu)
-        base = args.seed if args.seed is not None else secrets.randbits(64)
+        base = args.seed if args.seed is not None else _from_bytes(_urandom(8), "little")
         result = handle_world_cmd(driver, base, args.unsigned)
         print(json.dumps(result), flush=True)
         driver.shutdown()
     except Exception as e:
         # Fallback im One-Shot Modus
         sys.stderr.write(f"[Mycelia] One-Shot fehlgeschlagen: {e}. Nutze Python-Fallback.\n")
-        theme = random.choice(PALETTES)
-        fallback_seed = args.seed if args.seed is not None else secrets.randbits(64)
-        result = {
-            "seed": fallback_seed if args.unsigned else _i64_from_u64(fallback_seed),
-            "baseBlock": theme["base"],
-            "surfaceBlock": theme["surface"],
-            "oreBlock": theme["ore"],
-            "scale": theme["scale"],
-            "seaLevel": 62,
-            "fallback": True
-        }
-        print(json.dumps(result), flush=True)
+        _run_fallback(args)
 
 # --- Main Entry ---
 def main():
@@ -213,29 +386,38 @@ def main():
     ap.add_argument("--seed", type=int, help="Basis-Seed (int)")
     ap.add_argument("--gpu", type=int, default=0, help="GPU-Index")
     ap.add_argument("--unsigned", action="store_true", help="Unsigned Output")
+    ap.add_argument("--no-gpu", action="store_true", help="One-Shot: GPU überspringen, direkt Python-Fallback")
     ap.add_argument("--persistent", action="store_true", help="Erzwinge Persistent Mode")
+    ap.add_argument("--listen", action="store_true", help="Bediene Befehle über lokalen TCP-Socket (Sidecar)")
+    ap.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, help="Listen: Sekunden ohne Client bis zum Beenden (0 = nie)")
+    ap.add_argument("--framed", action="store_true", help="Eingabe als 4-Byte-Längenpräfix + JSON statt Zeilen")
     ap.add_argument("--oneshot", action="store_true", help="Erzwinge One-Shot Mode (überschreibt persistent)")
 
     args = ap.parse_args()
 
     # Regelwerk:
     # 1) --oneshot erzwingt One-Shot
-    # 2) --persistent erzwingt persistent
-    # 3) Wenn ein Seed explizit übergeben wurde -> One-Shot (klassischer CLI-Aufruf)
-    # 4) Sonst -> persistent (Plugin-Standardfall: startet mit --gpu/--unsigned etc.)
+    # 2) --listen startet den Socket-Sidecar
+    # 3) --persistent erzwingt persistent
+    # 4) Wenn ein Seed explizit übergeben wurde -> One-Shot (klassischer CLI-Aufruf)
+    # 5) Sonst -> persistent (Plugin-Standardfall: startet mit --gpu/--unsigned etc.)
     if args.oneshot:
         run_oneshot(args)
         return
 
+    if args.listen:
+        run_listen(args.gpu, args.unsigned, args.framed, args.idle_timeout)
+        return
+
     if args.persistent:
-        run_persistent(args.gpu, args.unsigned)
+        run_persistent(args.gpu, args.unsigned, args.framed)
         return
 
     if args.seed is not None:
         run_oneshot(args)
         return
 
-    run_persistent(args.gpu, args.unsigned)
+    run_persistent(args.gpu, args.unsigned, args.framed)
 
 
 if __name__ == "__main__":
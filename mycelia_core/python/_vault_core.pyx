@@ -0,0 +1,25 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False
+"""
+Optionaler kompilierter XOR-Kern für mycelia_vault_v4.
+Build: cythonize -3 -i _vault_core.pyx  (ohne Build nutzt der Vault Numba/C/Numpy)
+"""
+
+def xor_key_bytes(const unsigned char[::1] key, const unsigned char[::1] data, unsigned char[::1] out):
+    """out[i] = data[i] ^ key[i] für alle Datenbytes, ohne GIL."""
+    cdef Py_ssize_t i, n = data.shape[0]
+    if key.shape[0] < n or out.shape[0] < n:
+        raise ValueError("key/out kürzer als data")
+    with nogil:
+        for i in range(n):
+            out[i] = data[i] ^ key[i]
+
+def xor_derive(const unsigned int[::1] raw, const unsigned char[::1] data, unsigned char[::1] out):
+    """Hash (Float -> Byte) und XOR in einem Durchlauf, wie der Numba-Kernel."""
+    cdef Py_ssize_t i, n = data.shape[0]
+    cdef unsigned int v
+    if raw.shape[0] < n or out.shape[0] < n:
+        raise ValueError("raw/out kürzer als data")
+    with nogil:
+        for i in range(n):
+            v = raw[i]
+            out[i] = data[i] ^ <unsigned char>(((v ^ (v >> 16)) * 0x45d9f3bU) & 0xFF)
@@ -4,6 +4,8 @@ mein_subqg_seed_script.py (hardened)
 
 Garantiert:
 - Gibt innerhalb von --timeout Sekunden einen Seed auf STDOUT aus (auch Fallback).
+- Fragt zuerst den Sidecar-Treiber (../mc_mycelia, --listen) an und startet ihn
+  bei Bedarf, damit DLL-Load und GPU-Kontext nicht pro Aufruf anfallen.
 - Nutzt CC_OpenCl.dll relativ zu ../bin.
 - Loggt Fehler kurz auf STDERR.
 """
@@ -12,20 +14,39 @@ from __future__ import annotations
 
 import argparse
 import ctypes
+import json
 import os
 import pathlib
-import secrets
+import socket
 import struct
+import subprocess
 import sys
-from multiprocessing import Process, Queue
+import time
+from queue import Empty, Queue
+from threading import Thread
 from typing import Final
 
 RESULT_SUCCESS: Final[int] = 0
+STATE_FILE: Final[str] = "driver.json"
+LOCK_FILE: Final[str] = "driver.lock"
+SIDECAR_BUDGET: Final[float] = 0.3  # max. Anteil der Deadline für den Sidecar (Sekunden)
+SPAWN_LOCK_STALE: Final[float] = 10.0  # ältere Lock-Dateien gelten als verwaist
+
+# Vorkompilierte Formate (kein Re-Parsing pro Aufruf)
+_S_Q: Final = struct.Struct("<Q")
+_S_q: Final = struct.Struct("<q")
+
+# Fallback-Entropie direkt aus dem OS (gleiche Quelle wie secrets, ohne SystemRandom)
+_urandom = os.urandom
+_from_bytes = int.from_bytes
+
+
+def _dll_path(script_dir: pathlib.Path) -> pathlib.Path:
+    return (script_dir.parent / "bin" / "CC_OpenCl.dll").resolve()
 
 
 def _load_library(script_dir: pathlib.Path) -> ctypes.CDLL:
-    dll_name = "CC_OpenCl.dll"
-    candidate = (script_dir.parent / "bin" / dll_name).resolve()
+    candidate = _dll_path(script_dir)
     if not candidate.exists():
         raise FileNotFoundError(f"DLL nicht gefunden: {candidate}")
     return ctypes.WinDLL(str(candidate)) if os.name == "nt" else ctypes.CDLL(str(candidate))
@@ -68,13 +89,107 @@ def _u64(n: int) -> int:
 
 
 def _i64_from_u64(n: int) -> int:
-    raw = _u64(n)
-    return struct.unpack("<q", struct.pack("<Q", raw))[0]
+    return _S_q.unpack(_S_Q.pack(_u64(n)))[0]
+
+
+def _state_dir() -> pathlib.Path:
+    base = os.environ.get("LOCALAPPDATA")
+    root = pathlib.Path(base) if base else pathlib.Path.home() / ".cache"
+    return root / "mycelia"
+
+
+def _query_daemon(gpu_index: int, base_seed: int, timeout: float) -> int:
+    """Fragt den laufenden Sidecar nach einem Seed (unsigned 64-bit)."""
+    info = json.loads((_state_dir() / STATE_FILE).read_text(encoding="utf-8"))
+    if info.get("gpu") != gpu_index:
+        raise ValueError(f"Sidecar bedient GPU {info.get('gpu')}, nicht {gpu_index}")
+    with socket.create_connection(("127.0.0.1", int(info["port"])), timeout=timeout) as sock:
+        sock.sendall(json.dumps({"cmd": "world", "seed": _u64(base_seed)}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("Sidecar hat ohne Antwort geschlossen")
+    return _u64(int(json.loads(line)["seed"]))
+
+
+def _claim_spawn() -> bool:
+    """
+    Nur ein Aufrufer startet den Sidecar: Lock-Datei exklusiv anlegen. Der
+    Sidecar entfernt sie, sobald er lauscht; verwaiste Locks werden übernommen.
+    """
+    lock = _state_dir() / LOCK_FILE
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime < SPAWN_LOCK_STALE:
+                    return False
+                lock.unlink()
+            except FileNotFoundError:
+                pass
+            continue
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        return True
+    return False
+
+
+def _spawn_daemon(script_dir: pathlib.Path, gpu_index: int) -> None:
+    """Startet den persistenten Treiber losgelöst im --listen Modus."""
+    driver_script = script_dir.parent / "mc_mycelia" / "mein_subqg_seed_script.py"
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(
+        [sys.executable, str(driver_script), "--listen", "--unsigned", "--gpu", str(gpu_index)],
+        cwd=str(script_dir.parent),  # ../bin als CWD-Fallback für die DLL
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+
+
+def _seed_from_daemon(script_dir: pathlib.Path, gpu_index: int, base_seed: int, deadline: float) -> int | None:
+    """
+    Versucht den Sidecar höchstens bis deadline; der Aufrufer übergibt nur
+    einen kleinen Teil seines Budgets, der Rest bleibt für den DLL-Thread.
+    """
+    try:
+        return _query_daemon(gpu_index, base_seed, max(deadline - time.monotonic(), 0.05))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # Ohne DLL kann auch der Sidecar nichts liefern -> direkt in-process (echter Fehler)
+    if not _dll_path(script_dir).exists():
+        return None
+
+    # Kein passender Sidecar erreichbar: höchstens ein Aufrufer startet ihn
+    try:
+        if _claim_spawn():
+            _spawn_daemon(script_dir, gpu_index)
+    except OSError as exc:
+        sys.stderr.write(f"[mein_subqg_seed_script] sidecar start failed: {exc}\n")
+        return None
+
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            return _query_daemon(gpu_index, base_seed, max(deadline - time.monotonic(), 0.05))
+        except (OSError, ValueError, KeyError):
+            continue
+    return None
 
 
 def _generate_seed_inner(dll_path_dir: pathlib.Path, gpu_index: int, base_seed: int, unsigned: bool, q: Queue) -> None:
     """
-    Läuft in separatem Prozess, damit wir harte Timeouts erzwingen können.
+    Läuft in einem Daemon-Thread; main() wartet höchstens --timeout Sekunden
+    auf das Ergebnis. Ein hängender DLL-Aufruf wird nicht abgebrochen, sondern
+    zurückgelassen – der Prozess endet direkt nach der Fallback-Ausgabe.
     """
     try:
         lib = _load_library(dll_path_dir)
@@ -102,11 +217,7 @@ def _generate_seed_inner(dll_path_dir: pathlib.Path, gpu_index: int, base_seed:
             if rc != RESULT_SUCCESS:
                 raise RuntimeError(f"myc_process_buffer fehlgeschlagen (Code {rc}): {_last_error(lib)}")
 
-            raw = bytes(buf)
-            if unsigned:
-                seed = struct.unpack("<Q", raw)[0]
-            else:
-                seed = struct.unpack("<q", raw)[0]
+            seed = (_S_Q if unsigned else _S_q).unpack_from(buf)[0]
 
             q.put(("ok", int(seed)))
         finally:
@@ -122,37 +233,44 @@ def main() -> int:
     ap.add_argument("--gpu", type=int, default=0, help="GPU-Index (Default: 0)")
     ap.add_argument("--timeout", type=float, default=2.0, help="Max. Sekunden für Treiber/Seed (Default: 2.0)")
     ap.add_argument("--unsigned", action="store_true", help="Seed als unsigned 64-bit ausgeben (Default: signed)")
+    ap.add_argument("--no-daemon", action="store_true", help="Sidecar-Treiber nicht verwenden/starten")
     args = ap.parse_args()
 
     script_dir = pathlib.Path(__file__).resolve().parent
-    base_seed = args.seed if args.seed is not None else secrets.randbits(64)
+    base_seed = args.seed if args.seed is not None else _from_bytes(_urandom(8), "little")
+    deadline = time.monotonic() + args.timeout
+
+    if not args.no_daemon:
+        # Sidecar bekommt nur einen kleinen Teil der Deadline (Kaltstart läuft im Hintergrund weiter)
+        budget = min(SIDECAR_BUDGET, args.timeout / 4)
+        seed = _seed_from_daemon(script_dir, args.gpu, base_seed, time.monotonic() + budget)
+        if seed is not None:
+            print(seed if args.unsigned else _i64_from_u64(seed))
+            return 0
 
     q: Queue = Queue()
-    p = Process(
+    t = Thread(
         target=_generate_seed_inner,
         args=(script_dir, args.gpu, base_seed, args.unsigned, q),
         daemon=True,
     )
-    p.start()
-    p.join(timeout=args.timeout)
+    t.start()
 
-    if p.is_alive():
-        # Hard timeout: kill process and fallback
-        p.kill()
-        p.join(timeout=0.2)
+    try:
+        status, payload = q.get(timeout=max(deadline - time.monotonic(), 0.0))
+    except Empty:
+        # Timeout: Thread zurücklassen (daemon) und Fallback ausgeben
         sys.stderr.write(f"[mein_subqg_seed_script] timeout>{args.timeout}s -> fallback\n")
-        fallback = secrets.randbits(64)
+        fallback = _from_bytes(_urandom(8), "little")
         print(fallback if args.unsigned else _i64_from_u64(fallback))
         return 0
 
-    if not q.empty():
-        status, payload = q.get()
-        if status == "ok":
-            print(payload)
-            return 0
-        sys.stderr.write(f"[mein_subqg_seed_script] driver_error -> fallback: {payload}\n")
+    if status == "ok":
+        print(payload)
+        return 0
+    sys.stderr.write(f"[mein_subqg_seed_script] driver_error -> fallback: {payload}\n")
 
-    fallback = secrets.randbits(64)
+    fallback = _from_bytes(_urandom(8), "little")
     print(fallback if args.unsigned else _i64_from_u64(fallback))
     return 0
 
@@ -5,6 +5,7 @@ import sys
 import os
 import time
 import queue
+from concurrent.futures import ThreadPoolExecutor
 
 # --- WICHTIG: Import der Backend-Logik ---
 # Die Datei 'mycelia_vault_v4.py' muss im selben Ordner liegen!
@@ -30,23 +31,32 @@ COLOR_ERROR = "#ff5555"
 FONT_MAIN = ("Segoe UI", 10)
 FONT_MONO = ("Consolas", 9)
 
-class IORedirector(object):
+class ProgressReporter(object):
     """
-    Fängt print-Ausgaben (stdout) vom Backend ab 
-    und sendet sie sicher an die GUI-Queue.
+    Liefert die progress/log-Callbacks für das Backend und stellt Fortschritt
+    und Meldungen als typisierte Einträge in die GUI-Queue.
     """
-    def __init__(self, text_queue):
-        self.text_queue = text_queue
+    def __init__(self, msg_queue):
+        self.msg_queue = msg_queue
 
-    def write(self, string):
-        self.text_queue.put(string)
+    def progress(self, mb):
+        self.msg_queue.put({"kind": "progress", "mb": mb})
 
-    def flush(self):
-        pass
+    def log(self, level, msg):
+        self.msg_queue.put({"kind": "log", "level": level, "msg": msg})
+
+def start_engine():
+    """Startet DLL-Load + GPU-Init sofort im Hintergrund und liefert ein Future."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(MyceliaVaultV4)
+    executor.shutdown(wait=False)
+    return future
 
 class MyceliaVaultGUI:
-    def __init__(self, root):
+    def __init__(self, root, engine_future=None):
         self.root = root
+        # Engine-Init läuft parallel zum Aufbau der Widgets
+        self.engine_future = engine_future or start_engine()
         self.root.title("Mycelia Vault V4 [Enterprise]")
         self.root.geometry("700x550")
         self.root.configure(bg=COLOR_BG)
@@ -55,6 +65,7 @@ class MyceliaVaultGUI:
 
         # Queue für Thread-sichere Kommunikation
         self.msg_queue = queue.Queue()
+        self.reporter = ProgressReporter(self.msg_queue)
         self.vault_instance = None
         self.is_processing = False
         self.total_size_mb = 1 # Default um Division durch Null zu vermeiden
@@ -62,9 +73,9 @@ class MyceliaVaultGUI:
         self._setup_styles()
         self._build_ui()
         
-        # Start Routine: Engine laden (verzögert, damit GUI erst sichtbar wird)
+        # Start Routine: auf die bereits laufende Engine-Initialisierung warten
         self.log_manual("Systemstart...", "info")
-        self.root.after(100, self._init_engine_thread)
+        self._init_engine_thread()
         self.root.after(100, self._process_queue)
 
     def _setup_styles(self):
@@ -179,58 +190,52 @@ class MyceliaVaultGUI:
         self.txt_log.see(tk.END)
         self.txt_log.config(state="disabled")
 
+    def _append_log(self, entries):
+        """Schreibt mehrere (Nachricht, Tag)-Paare mit einem einzigen Insert"""
+        args = []
+        for message, tag in entries:
+            args.extend((f"> {message}\n", tag))
+        self.txt_log.config(state="normal")
+        self.txt_log.insert(tk.END, *args)
+        self.txt_log.see(tk.END)
+        self.txt_log.config(state="disabled")
+
     def _process_queue(self):
         """Liest Ausgaben vom Worker-Thread und aktualisiert die UI"""
+        # Pro Tick sammeln: alle Log-Zeilen, aber nur der letzte Fortschritt
+        pending = []
+        current_mb = None
         try:
             while True:
                 msg = self.msg_queue.get_nowait()
-                
-                # Check ob es eine Fortschrittsmeldung ist
-                if "\r" in msg or msg.startswith("[Vault] Verarbeite:") or msg.startswith("[Vault] Entschlüssele:"):
-                    clean_msg = msg.replace("\r", "").strip()
-                    self.lbl_status.config(text=clean_msg)
-                    
-                    # Versuch, MB Zahl zu parsen für den Balken
-                    try:
-                        parts = clean_msg.split(" ")
-                        for part in parts:
-                            if "." in part and part.replace(".", "").isdigit():
-                                current_mb = float(part)
-                                if self.total_size_mb > 0:
-                                    perc = (current_mb / self.total_size_mb) * 100
-                                    self.progress['value'] = perc
-                    except:
-                        pass
+                if msg["kind"] == "progress":
+                    current_mb = msg["mb"]
                 else:
-                    # Normale Log-Nachricht
-                    clean_msg = msg.strip()
-                    if clean_msg:
-                        tag = "vault"
-                        if "FEHLER" in clean_msg or "CRITICAL" in clean_msg or "WARNUNG" in clean_msg:
-                            tag = "error"
-                        elif "Erfolg" in clean_msg or "BESTÄTIGT" in clean_msg:
-                            tag = "success"
-                        
-                        self.log_manual(clean_msg, tag)
-                        
+                    pending.append((msg["msg"].strip(), msg["level"]))
         except queue.Empty:
             pass
+
+        if pending:
+            self._append_log(pending)
+        if current_mb is not None:
+            self.lbl_status.config(text=f"[Vault] Verarbeitet: {current_mb:.1f} MB")
+            self.progress['value'] = current_mb / max(self.total_size_mb, 1e-9) * 100
         
-        # Loop alle 50ms
-        self.root.after(50, self._process_queue)
+        # Loop alle 50ms, während laufender Verarbeitung alle 100ms
+        self.root.after(100 if self.is_processing else 50, self._process_queue)
 
     def _init_engine_thread(self):
-        """Initialisiert die OpenCL Engine im Hintergrund"""
+        """Wartet im Hintergrund auf die OpenCL Engine und meldet den Status"""
         def run():
             try:
-                self.vault_instance = MyceliaVaultV4()
+                self.vault_instance = self.engine_future.result()
                 count = len(self.vault_instance.gpus)
                 
                 self.root.after(0, lambda: self.lbl_gpu_status.config(
                     text=f"ENGINE AKTIV", foreground=COLOR_ACCENT))
-                self.msg_queue.put(f"[System] OpenCL Engine ({count} GPU) bereit.")
+                self.reporter.log("vault", f"[System] OpenCL Engine ({count} GPU) bereit.")
             except Exception as e:
-                self.msg_queue.put(f"[System] FEHLER bei GPU Init: {e}")
+                self.reporter.log("error", f"[System] FEHLER bei GPU Init: {e}")
                 self.root.after(0, lambda: self.lbl_gpu_status.config(
                     text="GPU FEHLER", foreground=COLOR_ERROR))
 
@@ -273,17 +278,17 @@ class MyceliaVaultGUI:
         threading.Thread(target=self._worker, args=(mode, inp, outp), daemon=True).start()
 
     def _worker(self, mode, inp, outp):
-        # Stdout umleiten, damit print() aus V4 in der GUI landet
-        original_stdout = sys.stdout
-        sys.stdout = IORedirector(self.msg_queue)
-        
+        # Backend meldet sich direkt über Callbacks (keine stdout-Umleitung)
+        progress = self.reporter.progress
+        log = self.reporter.log
+
         try:
             start_t = time.time()
             if mode == 'encrypt':
                 if not outp:
                     outp = inp + ".box"
-                self.msg_queue.put(f"[Task] Starte Verschlüsselung -> {os.path.basename(outp)}")
-                self.vault_instance.encrypt(inp, outp)
+                self.reporter.log("vault", f"[Task] Starte Verschlüsselung -> {os.path.basename(outp)}")
+                self.vault_instance.encrypt(inp, outp, progress=progress, log=log)
                 
             elif mode == 'decrypt':
                 target_dir = os.path.dirname(inp)
@@ -294,26 +299,27 @@ class MyceliaVaultGUI:
                         # Fallback: Ordner der Zieldatei nutzen
                         target_dir = os.path.dirname(outp)
                 
-                self.msg_queue.put(f"[Task] Starte Entschlüsselung...")
-                self.vault_instance.decrypt(inp, target_dir)
+                self.reporter.log("vault", f"[Task] Starte Entschlüsselung...")
+                self.vault_instance.decrypt(inp, target_dir, progress=progress, log=log)
 
             duration = time.time() - start_t
-            self.msg_queue.put(f"[Success] Vorgang beendet in {duration:.2f}s")
+            self.reporter.log("success", f"[Success] Vorgang beendet in {duration:.2f}s")
             self.root.after(0, lambda: self.progress.configure(value=100))
 
         except Exception as e:
-            self.msg_queue.put(f"CRITICAL ERROR: {str(e)}")
+            self.reporter.log("error", f"CRITICAL ERROR: {str(e)}")
             # Optional: Traceback in die Konsole (für Debug)
             import traceback
-            traceback.print_exc(file=original_stdout) 
+            traceback.print_exc()
         finally:
-            sys.stdout = original_stdout
             self.root.after(0, lambda: self._toggle_controls(True))
 
 if __name__ == "__main__":
+    # Engine vor Tk starten, damit DLL-Load und GPU-Init mit dem UI-Aufbau überlappen
+    engine_future = start_engine()
     root = tk.Tk()
     # Icon laden falls vorhanden
     # try: root.iconbitmap("icon.ico")
     # except: pass
-    app = MyceliaVaultGUI(root)
+    app = MyceliaVaultGUI(root, engine_future)
     root.mainloop()
\ No newline at end of file
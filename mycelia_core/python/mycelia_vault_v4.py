@@ -1,14 +1,37 @@
 import ctypes
+import mmap
 import struct
 import os
 import random
 import sys
 import zlib
 import hashlib
+import hmac
+import math
 import threading
 import time
+import queue
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 
+# Optional: BLAKE3 (SIMD) für den Integritäts-Tag
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# Optional: Numba für den fusionierten Hash+XOR-Kernel
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Optional: kompilierter XOR-Kern (Cython, siehe _vault_core.pyx)
+try:
+    import _vault_core
+except ImportError:
+    _vault_core = None
+
 # --- Funktion zum Finden von Ressourcen in der EXE ---
 def resource_path(relative_path):
     """ Ermittelt den absoluten Pfad, egal ob Skript oder EXE """
@@ -56,6 +79,27 @@ cl.subqg_initialize_state.argtypes = [ctypes.c_int, ctypes.c_float, ctypes.c_flo
 cl.subqg_inject_agents.argtypes = [ctypes.c_int, ctypes.POINTER(HPIOAgent), ctypes.c_int]
 cl.subqg_simulation_step.argtypes = [ctypes.c_int, ctypes.c_float, ctypes.c_float, ctypes.c_float, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
 cl.subqg_debug_read_channel.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_float), ctypes.c_int]
+# SIMD XOR-Kernel (neuere Builds); sonst XOR per Numpy
+try:
+    cl.xor_inplace.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    cl.xor_inplace.restype = None
+    HAS_XOR_KERNEL = True
+except AttributeError:
+    HAS_XOR_KERNEL = False
+# Gebündelte Key-Erzeugung (mehrere Blöcke pro Treiber-Aufruf, neuere Builds)
+try:
+    cl.subqg_generate_key_stream.argtypes = [ctypes.c_int, ctypes.c_ulonglong, ctypes.c_ulonglong, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t]
+    cl.subqg_generate_key_stream.restype = ctypes.c_int
+    HAS_KEY_STREAM = True
+except AttributeError:
+    HAS_KEY_STREAM = False
+# Key-Bytes direkt von der GPU (Scrambling im Kernel, 1 Byte statt 4 pro Zelle)
+try:
+    cl.subqg_debug_read_key_bytes.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    cl.subqg_debug_read_key_bytes.restype = ctypes.c_int
+    HAS_KEY_READBACK = True
+except AttributeError:
+    HAS_KEY_READBACK = False
 # cl.cc_get_last_error gibt es evtl nicht in jedem build, daher optional:
 try:
     cl.cc_get_last_error.restype = ctypes.c_char_p
@@ -65,11 +109,32 @@ except:
 # --- Konstanten V4 ---
 HEADER_MAGIC = b'MYZ4' 
 VERSION = 4
+HEADER_MAGIC_B3 = b'MYZ5' # V5: wie V4, aber Tag per Keyed BLAKE3
+HEADER_MAGIC_HMAC = b'MYZ6' # V6: wie V4, aber Tag per HMAC-SHA256 (SHA-NI via OpenSSL)
+TAG_SIZE = 64
+
+# Container-Formate: Magic -> Version im Header / Tag-Länge
+FORMAT_VERSIONS = {HEADER_MAGIC: VERSION, HEADER_MAGIC_B3: 5, HEADER_MAGIC_HMAC: 6}
+TAG_SIZES = {HEADER_MAGIC: TAG_SIZE, HEADER_MAGIC_B3: TAG_SIZE, HEADER_MAGIC_HMAC: 32}
+# Vorkompilierte Header-Felder (Little Endian, wie bisher auf x86/ARM geschrieben)
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
 GRID_SIZE = 256 * 256 # 65536 Zellen
 CHUNK_SIZE = GRID_SIZE # 1:1 Mapping: 1 Feld-Zustand verschlüsselt 64KB Daten
 QUEUE_SIZE = 4 # Kleinerer Puffer für mehr Stabilität
+QUEUE_SIZE_MAX = 64 # Obergrenze der zur Laufzeit eingestellten Pipeline-Tiefe
+DISK_BW_ESTIMATE = 500 * 1024 * 1024 # Angenommener Datendurchsatz (Bytes/s) für das Tuning
+TUNE_BLOCKS = 8 # Key-Blöcke für die Latenzmessung beim Start
+KEY_BATCH = 4 # Key-Blöcke pro subqg_generate_key_stream Aufruf
+BLOCK_STRIDE = 7919 # Seed-Abstand zwischen zwei Blöcken
+WRITE_BATCH = 1 << 20 # Fertige Blöcke sammeln bis 1 MiB, dann ein Schreib-Syscall
+HASH_SPAN = 1 << 20 # Zusammenhängende Ausgabe in 1 MiB-Spannen hashen (BLAKE3 verteilt auf Kerne)
 
 # GLOBAL LOCK für C-Zugriffe (Verhindert Race Conditions im VRAM Treiber)
+# Nicht per GPU-Slot auflösbar: der Treiber hält genau einen OpenCL-Kontext,
+# einen globalen SubQG-Zustand und einen globalen Deterministik-RNG
+# (subqg_set_deterministic_mode hat keinen Geräteindex).
 C_LOCK = threading.Lock()
 
 class GPUSlot:
@@ -78,146 +143,486 @@ class GPUSlot:
         self.index = index
         print(f"[System] Initialisiere GPU {index}...")
         res = cl.initialize_gpu(index)
+        # Zuletzt erzeugter Key-Batch: (seed, erster Blockindex, Bytes)
+        self._batch = None
+
+    def _simulate(self, block_seed):
+        """Seed setzen, Physik zurücksetzen, ein Evolutionsschritt. Nur unter C_LOCK aufrufen."""
+        # 1. Seed setzen
+        cl.subqg_set_deterministic_mode(1, ctypes.c_ulonglong(block_seed))
+
+        # 2. Reset Physics
+        cl.subqg_initialize_state(self.index, 0.5, 0.5, 0.005, 0.5)
 
-    def generate_key_block(self, seed, block_index):
+        # 3. Evolution
+        cl.subqg_simulation_step(self.index, 0.5, 0.5, 0.5, None, None, None, None, None, None, None, 0)
+
+    def read_key_field(self, seed, block_index, length=GRID_SIZE):
         """
-        Erzeugt einen Key-Block. 
+        Simuliert den Block und liefert die ersten length Zellen des Rohfelds als uint32-Array.
         WICHTIG: Durch C_LOCK abgesichert, damit globale C-Variablen nicht korrupt werden.
+        Das Ergebnis ist eine Sicht auf den Thread-Puffer und nur bis zum nächsten Aufruf gültig.
         """
-        import numpy as np
-        
+        # Deterministischer Seed für diesen Block
+        # Wir nutzen einen simplen linearen Offset für Stabilität
+        block_seed = seed + (block_index * BLOCK_STRIDE)
+        raw_buffer = _worker_raw_buffer()[:length]
+
         with C_LOCK:
-            # 1. Deterministischer Seed für diesen Block
-            # Wir nutzen einen simplen linearen Offset für Stabilität
-            block_seed = seed + (block_index * 7919) 
-            
-            cl.subqg_set_deterministic_mode(1, ctypes.c_ulonglong(block_seed))
-            
-            # 2. Reset Physics
-            cl.subqg_initialize_state(self.index, 0.5, 0.5, 0.005, 0.5)
-            
-            # 3. Evolution
-            cl.subqg_simulation_step(self.index, 0.5, 0.5, 0.5, None, None, None, None, None, None, None, 0)
-            
+            self._simulate(block_seed)
+
             # 4. Readback
-            raw_buffer = np.zeros(GRID_SIZE, dtype=np.float32)
-            cl.subqg_debug_read_channel(
+            res = cl.subqg_debug_read_channel(
                 self.index, 0, 
                 raw_buffer.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), 
-                GRID_SIZE
+                length
             )
-            
-            # 5. Hashing (Float -> Byte)
-            key_int = raw_buffer.view(np.uint32)
-            key_int = (key_int ^ (key_int >> 16)) * 0x45d9f3b
-            key_bytes = (key_int & 0xFF).astype(np.uint8)
-            
-            return key_bytes
+        if res <= 0:
+            raise RuntimeError("subqg_debug_read_channel fehlgeschlagen")
+        # Der Treiber liest höchstens subqg_cell_count Zellen (aktuell 1); der Rest
+        # zählt als 0 wie im genullten Puffer der Basisversion (Key-Byte 0)
+        raw_buffer[res:] = 0
+
+        return raw_buffer
+
+    def read_key_bytes(self, seed, block_index, length=GRID_SIZE):
+        """Simuliert den Block und liest die Key-Bytes (auf der GPU gehasht) zurück."""
+        import numpy as np
+
+        block_seed = seed + (block_index * BLOCK_STRIDE)
+        key_bytes = np.empty(length, dtype=np.uint8)
+
+        with C_LOCK:
+            self._simulate(block_seed)
+            res = cl.subqg_debug_read_key_bytes(self.index, 0, key_bytes.ctypes.data, length)
+        if res != length:
+            raise RuntimeError("subqg_debug_read_key_bytes fehlgeschlagen")
+
+        return key_bytes
+
+    def _batched_key_block(self, seed, block_index):
+        """Liefert den Key-Block aus dem aktuellen Batch, erzeugt bei Bedarf KEY_BATCH neue."""
+        import numpy as np
+
+        with C_LOCK:
+            batch = self._batch
+            if batch is None or batch[0] != seed or not 0 <= block_index - batch[1] < KEY_BATCH:
+                keys = np.empty(KEY_BATCH * GRID_SIZE, dtype=np.uint8)
+                seed_base = (seed + block_index * BLOCK_STRIDE) & 0xFFFFFFFFFFFFFFFF
+                res = cl.subqg_generate_key_stream(
+                    self.index, seed_base, BLOCK_STRIDE, KEY_BATCH, keys.ctypes.data, keys.nbytes
+                )
+                if res != KEY_BATCH:
+                    raise RuntimeError("subqg_generate_key_stream fehlgeschlagen")
+                batch = self._batch = (seed, block_index, keys)
+
+        offset = (block_index - batch[1]) * GRID_SIZE
+        return batch[2][offset:offset + GRID_SIZE]
+
+    def generate_key_block(self, seed, block_index, length=GRID_SIZE):
+        """Erzeugt einen Key-Block (Rohfeld -> Bytes), bei Bedarf auf length gekürzt."""
+        import numpy as np
+
+        if HAS_KEY_STREAM:
+            return self._batched_key_block(seed, block_index)
+        if HAS_KEY_READBACK:
+            return self.read_key_bytes(seed, block_index, length)
+
+        # Hashing (Float -> Byte), außerhalb des C_LOCK
+        key_int = self.read_key_field(seed, block_index, length)
+        key_int = (key_int ^ (key_int >> 16)) * 0x45d9f3b
+        key_bytes = (key_int & 0xFF).astype(np.uint8)
+        
+        return key_bytes
+
+    def key_material(self, seed, block_index, length=GRID_SIZE):
+        """Schlüsselmaterial für einen Block: Rohfeld (fusionierter Pfad) oder Key-Bytes."""
+        if _FUSED:
+            # Kopie, da read_key_field in den wiederverwendeten Thread-Puffer liest
+            return self.read_key_field(seed, block_index, length).copy()
+        return self.generate_key_block(seed, block_index, length)
+
+class KeyStream:
+    """
+    Key-Producer: erzeugt das Schlüsselmaterial in einem eigenen Thread vorab,
+    Block für Block in Reihenfolge. Die XOR-Worker berühren die GPU nicht mehr.
+    """
+    def __init__(self, gpu_slot, seed, size, depth=QUEUE_SIZE * 2):
+        self._ring = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(gpu_slot, seed, size), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._ring.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, gpu_slot, seed, size):
+        try:
+            for block_index, offset in enumerate(range(0, size, CHUNK_SIZE)):
+                n = min(CHUNK_SIZE, size - offset)
+                if not self._put(gpu_slot.key_material(seed, block_index, n)):
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def next(self):
+        item = self._ring.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if njit is not None:
+    @njit(nogil=True, fastmath=True, cache=True)
+    def _xor_derive(raw_u32, data, out):
+        """Hash (Float -> Byte) und XOR in einem Durchlauf, direkt in out."""
+        for i in range(data.shape[0]):
+            v = raw_u32[i]
+            k = (v ^ (v >> 16)) * 0x45d9f3b
+            out[i] = data[i] ^ (k & 0xFF)
+else:
+    _xor_derive = None
+
+# Fusionierter Pfad nur, wenn der Treiber keine fertigen Key-Bytes liefert
+_FUSED = (_vault_core is not None or _xor_derive is not None) and not (HAS_KEY_STREAM or HAS_KEY_READBACK)
+
+# Pro Worker-Thread wiederverwendeter Readback-Puffer
+_TLS = threading.local()
+
+def _worker_raw_buffer():
+    raw = getattr(_TLS, "raw", None)
+    if raw is None:
+        import numpy as np
+        # Direkt als uint32: der Treiber schreibt float32-Bits, wir brauchen nur das Bitmuster
+        raw = _TLS.raw = np.empty(GRID_SIZE, dtype=np.uint32)
+    return raw
+
+def _new_hasher(magic, master_seed):
+    """Keyed Hasher für den Integritäts-Tag des jeweiligen Container-Formats."""
+    if magic == HEADER_MAGIC_B3:
+        key = _U64.pack(master_seed).ljust(32, b"\0")
+        # AUTO: große update()-Aufrufe laufen parallel über alle Kerne (blake3 >= 0.3)
+        auto = getattr(blake3.blake3, "AUTO", None)
+        if auto is None:
+            return blake3.blake3(key=key)
+        return blake3.blake3(key=key, max_threads=auto)
+    if magic == HEADER_MAGIC_HMAC:
+        return hmac.new(_U64.pack(master_seed).ljust(32, b"\0"), digestmod=hashlib.sha256)
+    return hashlib.blake2b(key=_U64.pack(master_seed))
+
+def _hash_range(hasher, view, start, end):
+    """Hasht view[start:end] ohne Kopie; der Slice wird direkt wieder freigegeben."""
+    with view[start:end] as span:
+        hasher.update(span)
+
+def _release_buffers(*bufs):
+    """
+    Gibt memoryviews frei bzw. schließt Maps. Läuft bereits eine Ausnahme, hält ihr
+    Traceback (Worker-Frames) evtl. noch Slices; der BufferError würde den echten
+    Fehler überdecken und wird dann geschluckt. None-Einträge werden übersprungen.
+    """
+    failing = sys.exc_info()[0] is not None
+    for buf in bufs:
+        if buf is None:
+            continue
+        try:
+            if isinstance(buf, memoryview):
+                buf.release()
+            else:
+                buf.close()
+        except BufferError:
+            if not failing:
+                raise
+
+def _tag_digest(hasher):
+    if blake3 is not None and isinstance(hasher, blake3.blake3):
+        return hasher.digest(length=TAG_SIZE)
+    return hasher.digest()
+
+def _write_batch(fout, chunks):
+    """Schreibt gesammelte Blöcke am Stück (writev, sonst ein einzelnes write)."""
+    if not hasattr(os, "writev"):
+        # Ungepuffertes FileIO darf kurz schreiben: Rest nachschieben
+        rest = memoryview(b"".join(chunks))
+        while rest:
+            rest = rest[fout.write(rest):]
+        return
+    fd = fout.fileno()
+    written = os.writev(fd, chunks)
+    total = sum(len(c) for c in chunks)
+    if written < total:
+        # Teilweise geschrieben: Rest nachschieben
+        rest = memoryview(b"".join(chunks))[written:]
+        while rest:
+            rest = rest[os.write(fd, rest):]
+
+class ConsoleReporter:
+    """Standard-Reporter: Fortschritt und Meldungen auf stdout (CLI)."""
+    def __init__(self, label="Verarbeite"):
+        self._label = label
+        self._progress_open = False
+
+    def progress(self, mb):
+        sys.stdout.write(f"\r[Vault] {self._label}: {mb:.1f} MB ...")
+        sys.stdout.flush()
+        self._progress_open = True
+
+    def log(self, level, msg):
+        if self._progress_open:
+            sys.stdout.write("\n")
+            self._progress_open = False
+        print(msg)
+
+class ProgressTicker:
+    """
+    Meldet den Fortschritt alle interval Sekunden aus einem eigenen Thread.
+    Die Pipeline setzt nur bytes_done und blockiert nie auf Terminal-/UI-Ausgabe.
+    """
+    def __init__(self, progress, interval=0.1):
+        self.bytes_done = 0
+        self._progress = progress
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        reported = None
+        while not self._stop.wait(self._interval):
+            done = self.bytes_done
+            if done != reported:
+                self._progress(done / 1024 / 1024)
+                reported = done
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        # Endstand einmal melden
+        self._progress(self.bytes_done / 1024 / 1024)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _resolve_callbacks(progress, log, label="Verarbeite"):
+    """Fehlende Callbacks fallen auf die Konsolenausgabe zurück."""
+    if progress is None or log is None:
+        console = ConsoleReporter(label)
+        progress = progress or console.progress
+        log = log or console.log
+    return progress, log
 
 class MyceliaVaultV4:
     def __init__(self):
         self.gpus = []
+        # Neue Container mit BLAKE3-Tag, sofern verfügbar, sonst HMAC-SHA256
+        self.magic = HEADER_MAGIC_B3 if blake3 is not None else HEADER_MAGIC_HMAC
+        # Pipeline-Tiefe und Worker-Anzahl, werden in _tune_pipeline gemessen
+        self.queue_size = QUEUE_SIZE
+        self.max_workers = 2
         self._detect_gpus()
+        self._tune_pipeline()
         
     def _detect_gpus(self):
         # FIX: Wir nutzen strikt NUR GPU 0 um Race Conditions zu vermeiden
         # Multi-Threading im Python-Teil ist okay, aber der C-State muss atomar sein.
+        # initialize_gpu(i) für i > 0 liefert keinen eigenen Kontext (Early-Return),
+        # weitere Slots würden denselben globalen Zustand teilen.
         self.gpus.append(GPUSlot(0))
         print(f"[System] Mycelia Engine aktiv (High-Precision Mode).")
 
-    def _process_chunk_task(self, gpu_slot, data_chunk, master_seed, block_index):
-        """Worker Funktion für ThreadPool"""
-        key_bytes = gpu_slot.generate_key_block(master_seed, block_index)
-        
-        # Key auf Datenlänge zuschneiden
+    def _tune_pipeline(self):
+        """
+        Misst die Key-Latenz pro Block und wählt die Queue-Tiefe so, dass die Pipeline
+        bei DISK_BW_ESTIMATE während einer GPU-Latenz nicht leerläuft.
+        """
+        # Erster Aufruf zahlt Kernel-Build/Allokation und Numba-JIT -> ungemessen.
+        # Eigener Seed, damit der KEY_BATCH-Cache die gemessenen Blöcke nicht vorwegnimmt.
+        self.gpus[0].key_material(1, 0)
+        t = time.perf_counter()
+        for i in range(TUNE_BLOCKS):
+            self.gpus[0].key_material(0, i)
+        latency = (time.perf_counter() - t) / TUNE_BLOCKS
+
+        depth = math.ceil(latency * DISK_BW_ESTIMATE / CHUNK_SIZE)
+        self.queue_size = min(QUEUE_SIZE_MAX, max(2 * QUEUE_SIZE, depth))
+        self.max_workers = max(2, min(self.queue_size, os.cpu_count() or 2))
+        print(f"[System] Pipeline: Tiefe {self.queue_size}, {self.max_workers} Worker "
+              f"(Key-Latenz {latency * 1000:.2f} ms/Block).")
+
+    def _xor_task(self, key, data_chunk, out):
+        """
+        Worker Funktion für ThreadPool: nur XOR mit vorab erzeugtem Schlüsselmaterial.
+        Das Ergebnis landet direkt in out (Slice der Ausgabe-Map oder Ring-Puffer).
+        """
+        if _vault_core is not None:
+            # Kompilierter Kern: arbeitet direkt auf den Puffern, ohne Numpy-Wrapper
+            if _FUSED:
+                _vault_core.xor_derive(key, data_chunk, out)
+            else:
+                _vault_core.xor_key_bytes(key, data_chunk, out)
+            return
+
         import numpy as np
         n = len(data_chunk)
-        current_key = key_bytes[:n]
-        
-        # Numpy XOR
-        np_data = np.frombuffer(data_chunk, dtype=np.uint8)
-        xor_result = np.bitwise_xor(np_data, current_key)
-        
-        return xor_result.tobytes()
+        data = np.frombuffer(data_chunk, dtype=np.uint8)
+        dst = np.frombuffer(out, dtype=np.uint8)
+
+        if _FUSED:
+            # Fusioniert: Rohfeld -> Hash -> XOR ohne Zwischen-Arrays
+            _xor_derive(key, data, dst)
+            return
+
+        if HAS_XOR_KERNEL:
+            # XOR in-place im C-Kernel (gibt den GIL frei), keine Zwischen-Arrays
+            dst[:] = data
+            cl.xor_inplace(dst.ctypes.data, key.ctypes.data, n)
+            return
+
+        # Numpy XOR, Key auf Datenlänge zugeschnitten
+        np.bitwise_xor(data, key[:n], out=dst)
+
+    def _run_mapped_blocks(self, mm_in, mm_out, out_base, size, master_seed, hasher, progress):
+        """
+        Verarbeitet size Bytes aus mm_in nach mm_out[out_base:] (Zero-Copy Slices).
+        Die Hash-Reihenfolge bleibt blockweise sequentiell.
+        """
+        # Key-Producer läuft vor, die Worker machen nur noch XOR
+        keys = KeyStream(self.gpus[0], master_seed, size, 2 * self.queue_size)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Eigener Thread fürs Hashen (hashlib/blake3 geben beim update den GIL frei)
+        hash_exec = ThreadPoolExecutor(max_workers=1)
+        pending_hash = None
+
+        src = memoryview(mm_in) if mm_in is not None else None
+        dst = memoryview(mm_out)
+        # Futures in Submit-Reihenfolge: der nächste zu hashende Block ist immer pending[0]
+        pending = deque()
+        offset = 0
+        hashed = 0 # bis hierhin (relativ zu out_base) ist die Ausgabe an den Hasher übergeben
+        # UI Progress im Hintergrund
+        ticker = ProgressTicker(progress)
+
+        try:
+            while True:
+                # Puffer füllen
+                while len(pending) < self.queue_size and offset < size:
+                    n = min(CHUNK_SIZE, size - offset)
 
-    def process_stream(self, input_path, output_path, master_seed, mode='encrypt'):
+                    # Submit task (Worker schreibt direkt in die Ausgabe-Map)
+                    ft = executor.submit(
+                        self._xor_task, keys.next(), src[offset:offset + n],
+                        dst[out_base + offset:out_base + offset + n]
+                    )
+                    pending.append((ft, offset, n))
+                    offset += n
+
+                if not pending:
+                    break
+
+                # In Reihenfolge hashen
+                ft, blk_off, n = pending.popleft()
+                ft.result()
+
+                # Fertige Blöcke in Spannen hashen; der Hash überlappt mit dem nächsten result()
+                done = blk_off + n
+                if done - hashed >= HASH_SPAN or done == size:
+                    if pending_hash:
+                        pending_hash.result()
+                    pending_hash = hash_exec.submit(_hash_range, hasher, dst, out_base + hashed, out_base + done)
+                    hashed = done
+
+                ticker.bytes_done = done
+
+            if pending_hash:
+                pending_hash.result()
+        finally:
+            ticker.close()
+            keys.close()
+            hash_exec.shutdown()
+            executor.shutdown()
+            # Views freigeben, sonst lassen sich die Maps nicht schließen
+            _release_buffers(dst, src)
+
+    def process_stream(self, input_path, output_path, master_seed, mode='encrypt', progress=None, log=None):
+        progress, log = _resolve_callbacks(progress, log)
         file_size = os.path.getsize(input_path)
         
         # Integritäts-Check (Keyed Hash)
-        hasher = hashlib.blake2b(key=struct.pack("Q", master_seed)[:32]) 
-        
-        # Wir nutzen 2 Worker (I/O und Compute parallel), aber C-Calls sind serialized via C_LOCK
-        executor = ThreadPoolExecutor(max_workers=2)
+        hasher = _new_hasher(self.magic, master_seed)
         
-        futures = {} 
-        block_index = 0
-        
-        with open(input_path, 'rb') as fin, open(output_path, 'wb') as fout:
-            # Header schreiben (nur bei Encrypt)
-            if mode == 'encrypt':
-                fn = os.path.basename(input_path).encode('utf-8')
-                # Container Format V4: [Magic 4][Ver 4][Seed 8][FnLen 2][Fn Bytes...][Content...]
-                header = HEADER_MAGIC + struct.pack('I', VERSION) + struct.pack('Q', master_seed)
-                header += struct.pack('H', len(fn)) + fn
-                fout.write(header)
-                hasher.update(header)
-            
-            # Reader Loop
-            while True:
-                # Puffer füllen
-                while len(futures) < QUEUE_SIZE:
-                    chunk = fin.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    
-                    gpu = self.gpus[0] # Immer GPU 0
-                    
-                    # Submit task
-                    ft = executor.submit(self._process_chunk_task, gpu, chunk, master_seed, block_index)
-                    futures[block_index] = ft
-                    block_index += 1
-                
-                if not futures:
-                    break
-                
-                # In Reihenfolge schreiben
-                next_write_idx = min(futures.keys())
-                result_chunk = futures[next_write_idx].result()
-                del futures[next_write_idx]
-                
-                # Schreiben & Hashen
-                fout.write(result_chunk)
-                hasher.update(result_chunk)
-                
-                # UI Progress
-                if next_write_idx % 10 == 0:
-                    processed_mb = (next_write_idx * CHUNK_SIZE) / 1024 / 1024
-                    sys.stdout.write(f"\r[Vault] Verarbeite: {processed_mb:.1f} MB ...")
-                    sys.stdout.flush()
+        header = b''
+        if mode == 'encrypt':
+            fn = os.path.basename(input_path).encode('utf-8')
+            # Container Format V4-V6: [Magic 4][Ver 4][Seed 8][FnLen 2][Fn Bytes...][Content...][Tag]
+            header = self.magic + _U32.pack(FORMAT_VERSIONS[self.magic]) + _U64.pack(master_seed)
+            header += _U16.pack(len(fn)) + fn
+            hasher.update(header)
+        tag_len = TAG_SIZES[self.magic] if mode == 'encrypt' else 0
+        out_size = len(header) + file_size + tag_len
 
-            sys.stdout.write("\n")
-            
-            if mode == 'encrypt':
-                # Tag anhängen
-                tag = hasher.digest()
-                fout.write(tag)
-                print(f"[Vault] Integrity Tag generiert: {tag.hex()[:16]}...")
+        with open(input_path, 'rb') as fin, open(output_path, 'w+b') as fout:
+            if out_size == 0:
+                return
+
+            # Ein- und Ausgabe als Memory-Map: Worker lesen/schreiben direkt an ihrem Offset
+            fout.truncate(out_size)
+            mm_out = mmap.mmap(fout.fileno(), out_size)
+            mm_in = None
+            try:
+                if file_size:
+                    mm_in = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+                    if hasattr(mm_in, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm_in.madvise(mmap.MADV_SEQUENTIAL)
+
+                mm_out[:len(header)] = header
+                self._run_mapped_blocks(mm_in, mm_out, len(header), file_size, master_seed, hasher, progress)
+
+                if mode == 'encrypt':
+                    # Tag anhängen
+                    tag = _tag_digest(hasher)
+                    mm_out[out_size - tag_len:] = tag
+                    log("vault", f"[Vault] Integrity Tag generiert: {tag.hex()[:16]}...")
+            finally:
+                _release_buffers(mm_in, mm_out)
             
-    def encrypt(self, input_file, output_file):
+    def encrypt(self, input_file, output_file, progress=None, log=None):
+        progress, log = _resolve_callbacks(progress, log)
         seed = random.randint(0, 2**64 - 1)
-        print(f"[Vault] Neuer Master-Seed: {seed}")
-        self.process_stream(input_file, output_file, seed, 'encrypt')
+        log("vault", f"[Vault] Neuer Master-Seed: {seed}")
+        self.process_stream(input_file, output_file, seed, 'encrypt', progress, log)
 
-    def decrypt(self, input_file, output_folder="."):
+    def decrypt(self, input_file, output_folder=".", progress=None, log=None):
+        progress, log = _resolve_callbacks(progress, log, "Entschlüssele")
         # Header lesen um Seed zu bekommen
         with open(input_file, 'rb') as f:
             magic = f.read(4)
-            if magic != HEADER_MAGIC:
-                print("FEHLER: Kein Mycelia V4 Format.")
+            if magic not in FORMAT_VERSIONS:
+                log("error", "FEHLER: Kein Mycelia V4-V6 Format.")
                 return
-            version = struct.unpack('I', f.read(4))[0]
-            seed = struct.unpack('Q', f.read(8))[0]
-            fn_len = struct.unpack('H', f.read(2))[0]
+            if magic == HEADER_MAGIC_B3 and blake3 is None:
+                log("error", "FEHLER: V5-Container benötigt das Paket 'blake3'.")
+                return
+            version = _U32.unpack(f.read(4))[0]
+            seed = _U64.unpack(f.read(8))[0]
+            fn_len = _U16.unpack(f.read(2))[0]
             fn_bytes = f.read(fn_len)
             original_filename = fn_bytes.decode('utf-8')
             
@@ -226,88 +631,117 @@ class MyceliaVaultV4:
             # Dateigröße für Tag-Handling
             f.seek(0, 2)
             total_size = f.tell()
-            tag_size = 64 # Blake2b digest size
+            tag_size = TAG_SIZES[magic]
             payload_size = total_size - data_start - tag_size
             
             if payload_size < 0:
-                print("FEHLER: Datei zu kurz oder beschädigt.")
+                log("error", "FEHLER: Datei zu kurz oder beschädigt.")
                 return
 
-        print(f"[Vault] Erkannt: '{original_filename}' (Seed {seed})")
+        log("vault", f"[Vault] Erkannt: '{original_filename}' (Seed {seed})")
         
         # Zielpfad
         out_path = os.path.join(output_folder, original_filename)
         
         # Exaktes Decrypten der Payload
-        self._decrypt_stream_bounded(input_file, out_path, seed, data_start, payload_size, tag_size)
+        self._decrypt_stream_bounded(input_file, out_path, seed, data_start, payload_size, tag_size, magic, progress, log)
 
-    def _decrypt_stream_bounded(self, input_path, output_path, master_seed, start_offset, payload_len, tag_size):
-        executor = ThreadPoolExecutor(max_workers=2)
-        futures = {}
-        block_index = 0
+    def _decrypt_stream_bounded(self, input_path, output_path, master_seed, start_offset, payload_len, tag_size, magic, progress, log):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = deque()
         bytes_processed = 0
+        # Ring wiederverwendeter Ausgabepuffer: reicht für alle Blöcke in Arbeit
+        # plus die, die auf den gebündelten Schreibvorgang warten
+        ring = [bytearray(CHUNK_SIZE) for _ in range(self.queue_size + WRITE_BATCH // CHUNK_SIZE)]
+        ring_free = deque(range(len(ring)))
+        # Fertige Blöcke (und ihre Ring-Slots) für den nächsten gebündelten Schreibvorgang
+        ready = []
+        ready_slots = []
+        ready_bytes = 0
         
-        hasher = hashlib.blake2b(key=struct.pack("Q", master_seed)[:32])
+        hasher = _new_hasher(magic, master_seed)
+        # Ciphertext wird wie beim Verschlüsseln im eigenen Thread gehasht, direkt aus der Map
+        hash_exec = ThreadPoolExecutor(max_workers=1)
+        pending_hash = None
         
-        with open(input_path, 'rb') as fin, open(output_path, 'wb') as fout:
-            # Header hashen (für Validierung)
-            fin.seek(0)
-            header_data = fin.read(start_offset)
-            hasher.update(header_data)
-            
-            # Payload Loop
-            while bytes_processed < payload_len:
-                while len(futures) < QUEUE_SIZE:
-                    # Berechne wie viel wir noch lesen dürfen (stoppt VOR dem Tag)
-                    remaining = payload_len - bytes_processed - (len(futures) * CHUNK_SIZE) 
-                    # Korrektur: bytes_processed ist das was schon geschrieben wurde.
-                    # Wir müssen wissen, wieviel schon in futures steckt.
-                    # Einfacher: wir schauen auf fin position.
-                    
-                    pos = fin.tell()
-                    remaining_payload = (start_offset + payload_len) - pos
-                    
-                    if remaining_payload <= 0:
-                        break
-                    
-                    to_read = min(CHUNK_SIZE, remaining_payload)
-                    chunk = fin.read(to_read)
-                    if not chunk: break
-                    
-                    # Hash update mit Ciphertext
-                    hasher.update(chunk)
-                    
-                    gpu = self.gpus[0]
-                    ft = executor.submit(self._process_chunk_task, gpu, chunk, master_seed, block_index)
-                    futures[block_index] = ft
-                    block_index += 1
-                
-                if not futures: break
-                
-                next_idx = min(futures.keys())
-                decrypted_chunk = futures[next_idx].result()
-                del futures[next_idx]
-                
-                fout.write(decrypted_chunk)
-                bytes_processed += len(decrypted_chunk)
-                
-                if next_idx % 10 == 0:
-                    sys.stdout.write(f"\r[Vault] Entschlüssele: {bytes_processed/1024/1024:.1f} MB")
+        with KeyStream(self.gpus[0], master_seed, payload_len, 2 * self.queue_size) as keys, \
+                open(input_path, 'rb') as fin, open(output_path, 'wb', buffering=0) as fout:
+            # Eingabe als Memory-Map: Hasher und Worker sehen dieselben Slices, keine Kopien
+            mm_in = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            src = memoryview(mm_in)
+            # Fortschritt im Hintergrund; endet vor der Integritätsprüfung
+            ticker = ProgressTicker(progress)
+            try:
+                # Payload endet VOR dem Tag
+                pos = start_offset
+                payload_end = start_offset + payload_len
+                # Header + Ciphertext bis hierhin an den Hasher übergeben
+                hashed = 0
+
+                # Payload Loop
+                while True:
+                    while len(pending) < self.queue_size and pos < payload_end:
+                        chunk = src[pos:min(pos + CHUNK_SIZE, payload_end)]
+                        pos += len(chunk)
+
+                        # Worker schreibt direkt in einen freien Ring-Slot
+                        slot = ring_free.popleft()
+                        out = memoryview(ring[slot])[:len(chunk)]
+                        ft = executor.submit(self._xor_task, keys.next(), chunk, out)
+                        pending.append((ft, chunk, slot, out))
+
+                    # Header (für Validierung) und Ciphertext in Spannen hashen, überlappt mit dem XOR
+                    if pos - hashed >= HASH_SPAN or (pos == payload_end and hashed < pos):
+                        if pending_hash:
+                            pending_hash.result()
+                        pending_hash = hash_exec.submit(_hash_range, hasher, src, hashed, pos)
+                        hashed = pos
+
+                    if not pending: break
+
+                    ft, chunk, slot, out = pending.popleft()
+                    try:
+                        ft.result()
+                    finally:
+                        _release_buffers(chunk)
+
+                    ready.append(out)
+                    ready_slots.append(slot)
+                    ready_bytes += len(out)
+                    if ready_bytes >= WRITE_BATCH:
+                        _write_batch(fout, ready)
+                        ring_free.extend(ready_slots)
+                        ready.clear()
+                        ready_slots.clear()
+                        ready_bytes = 0
+                    bytes_processed += len(out)
+                    ticker.bytes_done = bytes_processed
+
+                if ready:
+                    _write_batch(fout, ready)
+
+                if pending_hash:
+                    pending_hash.result()
+                file_tag = bytes(src[payload_end:payload_end + tag_size])
+            finally:
+                ticker.close()
+                executor.shutdown()
+                hash_exec.shutdown()
+                # Alle Slices freigeben, sonst lässt sich die Map nicht schließen
+                _release_buffers(*(chunk for _, chunk, _, _ in pending), src, mm_in)
 
             # Tag prüfen
-            print("\n[Vault] Prüfe Integrität...")
-            fin.seek(start_offset + payload_len)
-            file_tag = fin.read(tag_size)
-            calc_tag = hasher.digest()
+            log("vault", "[Vault] Prüfe Integrität...")
+            calc_tag = _tag_digest(hasher)
             
             if file_tag == calc_tag:
-                print("✅ INTEGRITÄT BESTÄTIGT. Datei ist authentisch.")
+                log("success", "✅ INTEGRITÄT BESTÄTIGT. Datei ist authentisch.")
             else:
-                print("❌ WARNUNG: INTEGRITÄTSFEHLER!")
-                print("   Die Datei wurde manipuliert oder die Physik-Engine war nicht deterministisch.")
+                log("error", "❌ WARNUNG: INTEGRITÄTSFEHLER!")
+                log("error", "   Die Datei wurde manipuliert oder die Physik-Engine war nicht deterministisch.")
                 fout.close()
                 os.rename(output_path, output_path + ".CORRUPT")
-                print(f"   Datei umbenannt in: {os.path.basename(output_path)}.CORRUPT")
+                log("error", f"   Datei umbenannt in: {os.path.basename(output_path)}.CORRUPT")
 
 if __name__ == "__main__":
     vault = MyceliaVaultV4()
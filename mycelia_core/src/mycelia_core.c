@@ -1948,6 +1948,12 @@ cl_kernel render_debug_kernel = NULL;
 cl_program brain_program = NULL;
 cl_kernel brain_bridge_kernel = NULL;
 
+// Key-Bytes Readback (Scrambling auf der GPU, 1 Byte pro Zelle)
+cl_program subqg_key_bytes_program = NULL;
+cl_kernel subqg_key_bytes_kernel = NULL;
+cl_mem subqg_key_bytes_buffer = NULL;
+size_t subqg_key_bytes_capacity = 0;
+
 static int g_force_debug_render = -1;
 static int g_debug_smoke_test_done = 0;
 
@@ -2612,6 +2618,11 @@ DLLEXPORT int subqg_debug_read_channel(int gpu_index,
                                        float* out_host,
                                        int max_len);
 
+DLLEXPORT int subqg_debug_read_key_bytes(int gpu_index,
+                                         int channel,
+                                         uint8_t* out_host,
+                                         int max_len);
+
 DLLEXPORT int subqg_debug_read_field(float* out_host, int max_len);
 
 static int ensure_subqg_state(int width, int height) {
@@ -3141,6 +3152,7 @@ DLLEXPORT int get_last_quantum_echo_profile(QuantumEchoProfile* out_profile);
 
 static int ensure_sqse_kernels_ready(void);
 static int ensure_brain_kernels(void);
+static int ensure_subqg_key_bytes_kernel(void);
 static cl_float2 make_complex(float real, float imag);
 static int ensure_quantum_kernels_ready(void);
 static int quantum_allocate_state(int num_qubits, QuantumStateGPU* state_out);
@@ -5728,6 +5740,22 @@ __kernel void autonomic_cycle_kernel(
 }
 )CLC";
 
+const char *subqg_key_bytes_kernel_src = R"CLC(
+__kernel void subqg_key_bytes(
+    __global const FP_TYPE* field,
+    __global uchar* out_bytes,
+    const int count)
+{
+    int gid = get_global_id(0);
+    if (gid >= count) return;
+
+    // Gleiches Scrambling wie auf dem Host: (v ^ (v >> 16)) * 0x45d9f3b, unterstes Byte
+    uint v = as_uint((float)field[gid]);
+    uint h = (v ^ (v >> 16)) * 0x45d9f3bu;
+    out_bytes[gid] = (uchar)(h & 0xFFu);
+}
+)CLC";
+
 const char *brain_bridge_kernel_src = R"CLC(
 __kernel void brain_bridge_cycle(
     /* Input: SubQG Environment */
@@ -7105,6 +7133,26 @@ static int ensure_brain_kernels(void) {
     return 1;
 }
 
+static int ensure_subqg_key_bytes_kernel(void) {
+    if (subqg_key_bytes_kernel) {
+        return 1;
+    }
+    if (!context || !device_id) {
+        fprintf(stderr, "[C] SubQG: OpenCL context/device not initialized. Call initialize_gpu first.\n");
+        return 0;
+    }
+
+    cl_int err = compile_opencl_kernel_variant(subqg_key_bytes_kernel_src, "subqg_key_bytes",
+                                               &subqg_key_bytes_program, &subqg_key_bytes_kernel, 0);
+    if (err != CL_SUCCESS || !subqg_key_bytes_kernel) {
+        fprintf(stderr, "[C] SubQG: Failed to compile subqg_key_bytes kernel: %s (%d)\n", clGetErrorString(err), err);
+        if (subqg_key_bytes_program) { clReleaseProgram(subqg_key_bytes_program); subqg_key_bytes_program = NULL; }
+        if (subqg_key_bytes_kernel) { clReleaseKernel(subqg_key_bytes_kernel); subqg_key_bytes_kernel = NULL; }
+        return 0;
+    }
+    return 1;
+}
+
 static int ensure_sqse_kernels_ready(void) {
     if (sqse_program && sqse_encrypt_kernel && sqse_decrypt_kernel) {
         return 1;
@@ -7277,6 +7325,7 @@ void shutdown_driver() {
     RELEASE_KERNEL(linguistic_hypothesis_generate_kernel);
     RELEASE_KERNEL(linguistic_pheromone_reinforce_kernel);
     RELEASE_KERNEL(brain_bridge_kernel);
+    RELEASE_KERNEL(subqg_key_bytes_kernel);
     RELEASE_KERNEL(render_kernel_img);
     RELEASE_KERNEL(render_kernel_buf);
     RELEASE_KERNEL(render_debug_kernel);
@@ -7414,6 +7463,7 @@ void shutdown_driver() {
     RELEASE_PROGRAM(mycel_program);
     RELEASE_PROGRAM(linguistic_program);
     RELEASE_PROGRAM(brain_program);
+    RELEASE_PROGRAM(subqg_key_bytes_program);
     RELEASE_PROGRAM(render_program);
     RELEASE_PROGRAM(sqse_program);
     RELEASE_PROGRAM(quantum_program);
@@ -7428,6 +7478,11 @@ void shutdown_driver() {
         clReleaseMemObject(shadow_self_generation_counter);
         shadow_self_generation_counter = NULL;
     }
+    if (subqg_key_bytes_buffer) {
+        clReleaseMemObject(subqg_key_bytes_buffer);
+        subqg_key_bytes_buffer = NULL;
+        subqg_key_bytes_capacity = 0;
+    }
 
     // Finish pending commands and release queues
     if (device_default_queue) {
@@ -9031,6 +9086,27 @@ DLLEXPORT int subqg_get_multifield_state_view(int gpu_index, SubQGMultiFieldHost
                                       view->drift_y);
 }
 
+static cl_mem subqg_channel_buffer(int channel, const char** name_out) {
+    cl_mem target = NULL;
+    const char* name = NULL;
+    switch (channel) {
+        case 0: target = subqg_energy_buffer; name = "energy"; break;
+        case 1: target = subqg_pressure_buffer; name = "pressure"; break;
+        case 2: target = subqg_gravity_buffer; name = "gravity"; break;
+        case 3: target = subqg_magnetic_buffer; name = "magnetism"; break;
+        case 4: target = subqg_temperature_buffer; name = "temperature"; break;
+        case 5: target = subqg_potential_buffer; name = "potential"; break;
+        case 6: target = subqg_drift_x_buffer; name = "drift_x"; break;
+        case 7: target = subqg_drift_y_buffer; name = "drift_y"; break;
+        case 8: target = subqg_field_map_buffer; name = "field_map"; break;
+        default: break;
+    }
+    if (name_out) {
+        *name_out = name;
+    }
+    return target;
+}
+
 DLLEXPORT int subqg_debug_read_channel(int gpu_index,
                                        int channel,
                                        float* out_host,
@@ -9053,22 +9129,12 @@ DLLEXPORT int subqg_debug_read_channel(int gpu_index,
         return 0;
     }
 
-    cl_mem target = NULL;
-    const char* name = NULL;
-    switch (channel) {
-        case 0: target = subqg_energy_buffer; name = "energy"; break;
-        case 1: target = subqg_pressure_buffer; name = "pressure"; break;
-        case 2: target = subqg_gravity_buffer; name = "gravity"; break;
-        case 3: target = subqg_magnetic_buffer; name = "magnetism"; break;
-        case 4: target = subqg_temperature_buffer; name = "temperature"; break;
-        case 5: target = subqg_potential_buffer; name = "potential"; break;
-        case 6: target = subqg_drift_x_buffer; name = "drift_x"; break;
-        case 7: target = subqg_drift_y_buffer; name = "drift_y"; break;
-        case 8: target = subqg_field_map_buffer; name = "field_map"; break;
-        default:
-            cc_set_last_error("subqg_debug_read_channel: invalid channel %d", channel);
-            return 0;
+    if (channel < 0 || channel > 8) {
+        cc_set_last_error("subqg_debug_read_channel: invalid channel %d", channel);
+        return 0;
     }
+    const char* name = NULL;
+    cl_mem target = subqg_channel_buffer(channel, &name);
     if (!target) {
         cc_set_last_error("subqg_debug_read_channel: buffer for channel %d is NULL", channel);
         return 0;
@@ -9085,6 +9151,89 @@ DLLEXPORT int subqg_debug_read_channel(int gpu_index,
     return nread;
 }
 
+// Wie subqg_debug_read_channel, aber das Scrambling zu Key-Bytes läuft auf der GPU:
+// zurückgelesen wird nur 1 Byte statt FP_TYPE pro Zelle. Rückgabe: max_len oder 0 bei Fehler.
+DLLEXPORT int subqg_debug_read_key_bytes(int gpu_index,
+                                         int channel,
+                                         uint8_t* out_host,
+                                         int max_len) {
+    (void)gpu_index;
+    if (!out_host || max_len <= 0) {
+        cc_set_last_error("subqg_debug_read_key_bytes: invalid output buffer");
+        return 0;
+    }
+    if (!subqg_state_initialized) {
+        cc_set_last_error("subqg_debug_read_key_bytes: state not initialized");
+        return 0;
+    }
+    if (!queue) {
+        cc_set_last_error("subqg_debug_read_key_bytes: Command queue not ready");
+        return 0;
+    }
+    if (subqg_cell_count <= 0) {
+        cc_set_last_error("subqg_debug_read_key_bytes: invalid cell count (%d)", subqg_cell_count);
+        return 0;
+    }
+    if (channel < 0 || channel > 8) {
+        cc_set_last_error("subqg_debug_read_key_bytes: invalid channel %d", channel);
+        return 0;
+    }
+    cl_mem target = subqg_channel_buffer(channel, NULL);
+    if (!target) {
+        cc_set_last_error("subqg_debug_read_key_bytes: buffer for channel %d is NULL", channel);
+        return 0;
+    }
+    if (!ensure_subqg_key_bytes_kernel()) {
+        cc_set_last_error("subqg_debug_read_key_bytes: kernel unavailable");
+        return 0;
+    }
+
+    int cells = subqg_cell_count;
+    int nread = (max_len < cells) ? max_len : cells;
+
+    cl_int err = CL_SUCCESS;
+    if (subqg_key_bytes_capacity < (size_t)nread) {
+        if (subqg_key_bytes_buffer) {
+            clReleaseMemObject(subqg_key_bytes_buffer);
+            subqg_key_bytes_buffer = NULL;
+            subqg_key_bytes_capacity = 0;
+        }
+        subqg_key_bytes_buffer = clCreateBuffer(context, CL_MEM_WRITE_ONLY, (size_t)cells, NULL, &err);
+        if (err != CL_SUCCESS || !subqg_key_bytes_buffer) {
+            cc_set_last_error("subqg_debug_read_key_bytes: Failed to allocate key buffer: %s (%d)",
+                              clGetErrorString(err), err);
+            subqg_key_bytes_buffer = NULL;
+            return 0;
+        }
+        subqg_key_bytes_capacity = (size_t)cells;
+    }
+
+    err  = clSetKernelArg(subqg_key_bytes_kernel, 0, sizeof(cl_mem), &target);
+    err |= clSetKernelArg(subqg_key_bytes_kernel, 1, sizeof(cl_mem), &subqg_key_bytes_buffer);
+    err |= clSetKernelArg(subqg_key_bytes_kernel, 2, sizeof(cl_int), &nread);
+    if (err != CL_SUCCESS) {
+        cc_set_last_error("subqg_debug_read_key_bytes: Failed to set kernel args (%d)", err);
+        return 0;
+    }
+    size_t global = (size_t)nread;
+    err = clEnqueueNDRangeKernel(queue, subqg_key_bytes_kernel, 1, NULL, &global, NULL, 0, NULL, NULL);
+    if (err != CL_SUCCESS) {
+        cc_set_last_error("subqg_debug_read_key_bytes: Kernel launch failed: %s (%d)", clGetErrorString(err), err);
+        return 0;
+    }
+    err = clEnqueueReadBuffer(queue, subqg_key_bytes_buffer, CL_TRUE, 0, (size_t)nread, out_host, 0, NULL, NULL);
+    if (err != CL_SUCCESS) {
+        cc_set_last_error("subqg_debug_read_key_bytes: Failed to read key bytes: %s (%d)", clGetErrorString(err), err);
+        return 0;
+    }
+    // Zellen jenseits des Zustands zählen als 0 (Key-Byte 0), wie beim Readback
+    // in einen genullten Float-Puffer: immer max_len gültige Bytes
+    if (nread < max_len) {
+        memset(out_host + nread, 0, (size_t)(max_len - nread));
+    }
+    return max_len;
+}
+
 DLLEXPORT int subqg_simulation_step(int gpu_index, float rng_energy, float rng_phase, float rng_spin,
                                     float* out_energy, float* out_phase, float* out_interference,
                                     int* out_node_flag, int* out_spin, int* out_topology,
@@ -18948,6 +19097,9 @@ int main(int argc, char** argv) {
 #include <stdarg.h>
 #include <stdio.h>
 #include <stdlib.h>
+#if defined(__AVX2__)
+#include <immintrin.h>
+#endif
 
 // ---------------------------------------------------------------------------
 // 1. C-Linkage Start (WICHTIG für g++ Kompatibilität!)
@@ -19020,6 +19172,59 @@ static void convert_field_to_bytes(const float* field, uint8_t* out_bytes, size_
     }
 }
 
+// XOR des Key-Streams in-place auf die Daten (AVX2, falls beim Build verfügbar)
+MY_API void xor_inplace(uint8_t* data, const uint8_t* key, size_t n) {
+    if (!data || !key) return;
+    size_t i = 0;
+#if defined(__AVX2__)
+    // 8 x 32 Byte pro Iteration, Rest in 32-Byte-Schritten
+    for (; i + 256 <= n; i += 256) {
+        for (size_t j = 0; j < 256; j += 32) {
+            __m256i d = _mm256_loadu_si256((const __m256i*)(data + i + j));
+            __m256i k = _mm256_loadu_si256((const __m256i*)(key + i + j));
+            _mm256_storeu_si256((__m256i*)(data + i + j), _mm256_xor_si256(d, k));
+        }
+    }
+    for (; i + 32 <= n; i += 32) {
+        __m256i d = _mm256_loadu_si256((const __m256i*)(data + i));
+        __m256i k = _mm256_loadu_si256((const __m256i*)(key + i));
+        _mm256_storeu_si256((__m256i*)(data + i), _mm256_xor_si256(d, k));
+    }
+#endif
+    // Skalarer Rest
+    for (; i < n; ++i) {
+        data[i] ^= key[i];
+    }
+}
+
+// Erzeugt n_blocks aufeinanderfolgende Key-Blöcke (je 256x256 Bytes) in einem Aufruf.
+// Block i nutzt den Seed seed_base + i * stride. Rückgabe: Anzahl Blöcke oder < 0.
+// Liefert der Zustand weniger Zellen als ein Block (subqg_cell_count), ist der Rest 0 -
+// wie beim Readback in einen genullten Puffer (eine Null-Zelle hasht auf Key-Byte 0).
+MY_API int subqg_generate_key_stream(int gpu_index, uint64_t seed_base, uint64_t stride,
+                                     int n_blocks, uint8_t* out, size_t out_len) {
+    const size_t block_size = 256 * 256;
+    if (!out || n_blocks <= 0) return -1;
+    if (out_len < (size_t)n_blocks * block_size) return -1;
+
+    for (int i = 0; i < n_blocks; ++i) {
+        subqg_set_deterministic_mode(1, seed_base + (uint64_t)i * stride);
+        subqg_initialize_state(gpu_index, 0.5f, 0.5f, 0.005f, 0.5f);
+        subqg_simulation_step(gpu_index, 0.5f, 0.5f, 0.5f, NULL, NULL, NULL, NULL, NULL, NULL, NULL, 0);
+        // Scrambling auf der GPU, Readback direkt in den Zielpuffer
+        uint8_t* block = out + (size_t)i * block_size;
+        int got = subqg_debug_read_key_bytes(gpu_index, 0, block, (int)block_size);
+        if (got <= 0) {
+            return -1;
+        }
+        if ((size_t)got < block_size) {
+            memset(block + got, 0, block_size - (size_t)got);
+        }
+    }
+
+    return n_blocks;
+}
+
 // ---------------------------------------------------------------------------
 // 4. API Implementation (Exportierte Funktionen)
 // ---------------------------------------------------------------------------
@@ -19137,9 +19342,7 @@ MY_API myc_result myc_process_buffer(myc_context_t ctx, uint8_t* data, size_t le
         size_t available_in_block = block_size - offset_in_block;
         size_t to_process = (remaining < available_in_block) ? remaining : available_in_block;
         
-        for (size_t i = 0; i < to_process; ++i) {
-            data[current_processed + i] ^= key_bytes[offset_in_block + i];
-        }
+        xor_inplace(data + current_processed, key_bytes + offset_in_block, to_process);
         
         current_processed += to_process;
     }